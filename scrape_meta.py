@@ -1,90 +1,159 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.html
 import yaml
 import os
 import json
+import hashlib
+import time
+from functools import lru_cache
+from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
 import re
 
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper  # backend C (libyaml)
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
 # Charger les variables d'environnement (.env contient OPENAI_API_KEY)
 load_dotenv()
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8"
+}
+
+# Session HTTP partagée : connexions keep-alive réutilisées (redirections, retries) sans refaire le handshake TLS
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=Retry(total=3, backoff_factor=0.3)))
+
+# Mappage des couleurs de bordure vers les coûts
+COLOR_TO_COST = {
+    "#bbbbbbe0": 1, # Gris
+    "#14cc73e0": 2, # Vert
+    "#54c3ffe0": 3, # Bleu
+    "#de0ebde0": 4, # Violet
+    "#ffc430e0": 5  # Or
+}
+# Classe CSS complète -> coût (un seul lookup dict par classe, sans manipulation de chaîne)
+CLASS_TO_COST = {f"border-[{color}]": cost for color, cost in COLOR_TO_COST.items()}
+# tactics.tools sert de l'UTF-8 ; on le force pour ne pas dépendre d'une balise meta charset
+_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+# Placement moyen affiché sous le label "Place" (ex: 4.21)
+PLACE_RE = re.compile(r'^\d\.\d+$')
+
+# Version de l'extraction HTML : à incrémenter dès que le parsing change (invalide le cache 304)
+SCRAPER_VERSION = 2
+# Version du prompt OpenAI : à incrémenter dès que les instructions changent (invalide le cache)
+PROMPT_VERSION = 4
+# Modèle OpenAI : le reformatage est mécanique, gpt-4o-mini suffit (surchargeable via .env)
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# Tentatives en cas de rate-limit (429) ou d'erreur transitoire (défaut du SDK : 2)
+OPENAI_MAX_RETRIES = 5
+# Durée de validité d'une réponse OpenAI en cache (secondes)
+OPENAI_CACHE_TTL = 6 * 3600
+
+def _cache_dir() -> Path:
+    p = Path(".cache") / "meta_tft"
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+def _openai_cache_dir() -> Path:
+    p = _cache_dir() / "openai_yaml"
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
 def scrape_tactics_tools():
-    """Scrape les compositions top meta de tactics.tools."""
+    """Scrape les compositions top meta de tactics.tools.
+
+    GET conditionnel (ETag / Last-Modified) : si la page n'a pas changé depuis le dernier run,
+    le serveur répond 304 et on reprend les compositions déjà extraites, sans télécharger ni parser.
+    """
     url = "https://tactics.tools/team-compositions"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8"
-    }
+    cache_path = _cache_dir() / "tactics_tools.json"
+    try:
+        cached = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        # Absent ou tronqué (run interrompu) : pas de cache
+        cached = {}
+    if cached.get("v") != SCRAPER_VERSION:
+        # Compos extraites par une ancienne version du parser : on re-télécharge
+        cached = {}
+    
+    conditional_headers = {}
+    if "comps" in cached:
+        if cached.get("etag"):
+            conditional_headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            conditional_headers["If-Modified-Since"] = cached["last_modified"]
     
     print(f"Chargement de {url}...")
-    response = requests.get(url, headers=headers, timeout=15)
+    response = _SESSION.get(url, headers=conditional_headers, timeout=15)
+    if response.status_code == 304 and conditional_headers:
+        print("Page inchangée (304), compositions reprises du cache.")
+        return cached["comps"], cached["champion_costs"]
     response.raise_for_status()
     
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # Parse direct avec lxml : traversée XPath en C, sans objets proxy BeautifulSoup
+    root = lxml.html.fromstring(response.content, parser=_HTML_PARSER)
     comps = []
+    seen_names = set()  # dédoublonnage O(1) des compos déjà collectées
     champion_costs = {}
 
-    # Mappage des couleurs de bordure vers les coûts
-    COLOR_TO_COST = {
-        "#bbbbbbe0": 1, # Gris
-        "#14cc73e0": 2, # Vert
-        "#54c3ffe0": 3, # Bleu
-        "#de0ebde0": 4, # Violet
-        "#ffc430e0": 5  # Or
-    }
-    
-    for title_el in soup.find_all(['h3', 'h4', 'div']):
-        text = title_el.get_text(strip=True)
+    # Seuls les titres h3/h4 sont candidats ; on ne remonte à la carte de compo la plus proche qu'en cas de match
+    for title_el in root.xpath("//h3 | //h4"):
+        text = title_el.text_content().strip()
         if '&' in text and len(text) < 60:
-            container = title_el.find_parent('div', class_=lambda x: x and 'p-2' in x) or title_el.parent
-            
+            cards = title_el.xpath("ancestor::div[contains(@class,'p-2')][1]")
+            container = cards[0] if cards else title_el.getparent()
             # Extraire les champions et leurs items de manière structurée
             champion_data = []
+            seen_champs = set()  # cartes imbriquées : un même champion peut être matché deux fois
             
             # Tenter d'extraire le placement moyen pour le classement dynamique
             avg_place = "4.5" # Valeur par défaut (B)
-            # On cherche tous les divs dans le container
-            all_divs = container.find_all('div')
+            # Le placement est souvent le div juste après le label "Place", sinon un peu plus loin :
+            # on ne sonde que les divs de la carte (following:: déborderait sur la carte suivante)
+            all_divs = container.xpath(".//div")
             for i, d in enumerate(all_divs):
-                txt = d.get_text(strip=True)
-                if txt == 'Place' and i + 1 < len(all_divs):
-                    # Le placement est souvent le div juste après
-                    avg_place = all_divs[i+1].get_text(strip=True)
-                    # Vérifier que c'est bien un nombre
-                    if not re.match(r'^\d\.\d+$', avg_place):
-                        # Si c'est pas le div suivant, on cherche un peu plus loin
-                        for j in range(i+1, min(i+4, len(all_divs))):
-                            potential = all_divs[j].get_text(strip=True)
-                            if re.match(r'^\d\.\d+$', potential):
-                                avg_place = potential
-                                break
-                    break
-            unit_containers = container.find_all('div', class_=lambda x: x and 'items-center' in x and 'flex-col' in x)
-            
+                if d.text_content().strip() != 'Place':
+                    continue
+                following = [n.text_content().strip() for n in all_divs[i + 1:i + 4]]
+                if following:
+                    avg_place = next((t for t in following if PLACE_RE.match(t)), following[0])
+                break
+            unit_containers = container.xpath(".//div[contains(@class,'items-center') and contains(@class,'flex-col')]")
+
             if not unit_containers:
-                unit_containers = container.find_all('div', class_=lambda x: x and 'relative' in x and 'flex-shrink-0' in x)
+                unit_containers = container.xpath(".//div[contains(@class,'relative') and contains(@class,'flex-shrink-0')]")
 
             for unit_div in unit_containers:
-                img = unit_div.find('img', alt=True)
-                if not img or len(img['alt']) > 25: continue
+                # Un seul parcours des images : la première est le champion, le reste ses items
+                imgs = unit_div.xpath('.//img[@alt]')
+                if not imgs: continue
+                img = imgs[0]
+                champ_name = img.get('alt')
+                if len(champ_name) > 25: continue
                 
-                champ_name = img['alt']
+                if champ_name in seen_champs:
+                    continue
+                seen_champs.add(champ_name)
                 
                 # Coût via bordure
-                classes = img.get('class', [])
-                for cls in classes:
-                    if 'border-[' in cls:
-                        hex_color = cls.replace('border-[', '').replace(']', '')
-                        if hex_color in COLOR_TO_COST:
-                            champion_costs[champ_name] = COLOR_TO_COST[hex_color]
+                for cls in img.get('class', '').split():
+                    cost = CLASS_TO_COST.get(cls)
+                    if cost:
+                        champion_costs[champ_name] = cost
                 
                 # Items du champion dans la compo
                 items = []
-                item_imgs = unit_div.find_all('img', alt=True)
-                for item_img in item_imgs:
-                    item_alt = item_img['alt']
+                for item_img in imgs[1:]:
+                    item_alt = item_img.get('alt')
                     if item_alt != champ_name and len(item_alt) > 3:
                         items.append(item_alt)
                 
@@ -93,8 +162,9 @@ def scrape_tactics_tools():
                     "items": items
                 })
 
-            if any(c['name'] == text for c in comps):
+            if text in seen_names:
                 continue
+            seen_names.add(text)
                 
             comps.append({
                 "name": text,
@@ -104,56 +174,73 @@ def scrape_tactics_tools():
             
             if len(comps) >= 20:
                 break
+    
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        # Écriture atomique : un run interrompu ne laisse jamais de cache tronqué
+        tmp_path = cache_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({
+            "v": SCRAPER_VERSION,
+            "etag": etag,
+            "last_modified": last_modified,
+            "comps": comps,
+            "champion_costs": champion_costs
+        }, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, cache_path)
                 
     return comps, champion_costs
 
-def generate_yaml_with_openai(raw_data, cost_mapping):
-    """Utilise OpenAI pour formater les données brutes selon le nouveau schéma avec champions_db."""
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
-    prompt = f"""
-Tu es un expert TFT (Teamfight Tactics). Voici des données brutes de compositions meta.
-Ta mission est de les transformer en un fichier YAML structuré.
+@lru_cache(maxsize=1)
+def _openai_client() -> OpenAI:
+    """Client OpenAI construit une seule fois par process (pool HTTP réutilisé).
 
-### DONNÉES BRUTES (Compositions et champions avec items scrappés) :
-{json.dumps(raw_data, indent=2)}
+    Le SDK réessaie lui-même les 429 / 5xx / erreurs de connexion et timeouts avec un
+    backoff exponentiel (+ jitter) qui respecte les en-têtes Retry-After : on augmente
+    simplement le nombre de tentatives pour absorber une congestion passagère de l'API.
+    """
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=OPENAI_MAX_RETRIES)
 
-### MAPPAGE DES COÛTS (IMPORTANT) :
-{json.dumps(cost_mapping, indent=2)}
-
-### FORMAT ATTENDU :
-```yaml
-meta:
-  - classement: "S" (ou S+, A+, A, B selon l'avg_place)
-    compo: "Nom de la compo"
-    early_chercher: "Champion1 / Champion2 / ..."
-    carries: "Champion1 / Champion2"
-    synergies: ["Trait1", "Trait2"]
-    compo_complete: "Liste des 7-9 champions"
-    champions: 
-      - name: "Champ1"
-        stars: 2
-      - name: "Champ2"
-        stars: 2
-      - name: "Champ3"
-        stars: 3
-      - name: "Champ4"
-        stars: 2
-      - name: "Champ5"
-        stars: 2
-      - name: "Champ6"
-        stars: 2
-      - name: "Champ7"
-        stars: 2
-      - name: "Champ8"
-        stars: 2
-
-champions_db:
-  "Nom":
-    cost: prix_gold (1 à 5)
-    traits: ["Trait1", "Trait2"]
-    items: ["Item1", "Item2", "Item3"]
+# Instructions statiques du prompt, placées avant les données : préfixe identique d'un appel
+# à l'autre, réutilisable par le cache de prompt OpenAI une fois le seuil atteint avec les données
+PROMPT_INSTRUCTIONS = """
+Tu es un expert TFT (Teamfight Tactics). Tu vas recevoir des données brutes de compositions meta.
+Ta mission est de les transformer en un objet JSON structuré.
+
+### FORMAT ATTENDU (objet JSON) :
+```json
+{
+  "meta": [
+    {
+      "classement": "S",
+      "compo": "Nom de la compo",
+      "early_chercher": "Champion1 / Champion2 / ...",
+      "carries": "Champion1 / Champion2",
+      "synergies": ["Trait1", "Trait2"],
+      "compo_complete": "Liste des 7-9 champions",
+      "champions": [
+        {"name": "Champ1", "stars": 2},
+        {"name": "Champ2", "stars": 2},
+        {"name": "Champ3", "stars": 3},
+        {"name": "Champ4", "stars": 2},
+        {"name": "Champ5", "stars": 2},
+        {"name": "Champ6", "stars": 2},
+        {"name": "Champ7", "stars": 2},
+        {"name": "Champ8", "stars": 2}
+      ]
+    }
+  ],
+  "champions_db": {
+    "Nom": {
+      "cost": 1,
+      "traits": ["Trait1", "Trait2"],
+      "items": ["Item1", "Item2", "Item3"]
+    }
+  }
+}
 ```
+- `classement` : "S+", "S", "A+", "A" ou "B" selon l'avg_place.
+- `cost` : prix en gold (entier de 1 à 5).
 
 ### INSTRUCTIONS CRITIQUES :
 1. **CLASSEMENT DYNAMIQUE** : Utilise le champ `avg_place` pour déterminer le `classement` (Tier) :
@@ -179,17 +266,60 @@ champions_db:
    - Un carry AP doit avoir des items AP (Jeweled Gauntlet, Spear of Shojin, etc.).
    - Un tank doit avoir des items tank (Warmog, Bramble Vest, etc.).
    - NE METS JAMAIS de nom de champion dans la liste des items.
-7. Réponds UNIQUEMENT en YAML.
+7. Réponds UNIQUEMENT avec l'objet JSON, sans texte autour.
+"""
+
+def generate_yaml_with_openai(raw_data, cost_mapping):
+    """Utilise OpenAI pour formater les données brutes selon le nouveau schéma avec champions_db.
+
+    La réponse est mise en cache (clé = hash des données + PROMPT_VERSION) : si la meta
+    scrapée n'a pas changé depuis moins de OPENAI_CACHE_TTL, l'appel OpenAI est évité.
+    """
+    key = hashlib.sha256(
+        json.dumps({"data": raw_data, "costs": cost_mapping, "v": PROMPT_VERSION, "model": OPENAI_MODEL}, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    cache_path = _openai_cache_dir() / f"{key}.yaml"
+    if cache_path.exists() and time.time() - cache_path.stat().st_mtime < OPENAI_CACHE_TTL:
+        print("Réponse OpenAI trouvée en cache, appel ignoré.")
+        return cache_path.read_text(encoding="utf-8")
+
+    client = _openai_client()
+    
+    # Données variables en dernier : le préfixe statique reste identique d'un run à l'autre
+    # et bénéficie du cache de prompt automatique d'OpenAI.
+    data_prompt = f"""### DONNÉES BRUTES (Compositions et champions avec items scrappés) :
+{json.dumps(raw_data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)}
+
+### MAPPAGE DES COÛTS (IMPORTANT) :
+{json.dumps(cost_mapping, ensure_ascii=False, separators=(',', ':'), sort_keys=True)}
 """
 
     print("Appel à OpenAI pour le formatage et la correction des items...")
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2
+    stream = client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": PROMPT_INSTRUCTIONS},
+            {"role": "user", "content": data_prompt},
+        ],
+        temperature=0.2,
+        response_format={"type": "json_object"},
+        stream=True
     )
     
-    return response.choices[0].message.content.strip()
+    # Streaming : les premiers tokens arrivent sans attendre la complétion entière
+    chunks = []
+    for chunk in stream:
+        if chunk.choices:
+            chunks.append(chunk.choices[0].delta.content or "")
+    
+    # Mode JSON : le modèle n'émet pas la syntaxe YAML token par token, on la génère localement
+    data = json.loads("".join(chunks))
+    content = yaml.dump(data, Dumper=SafeDumper, allow_unicode=True, sort_keys=False)
+    # Écriture atomique : un run interrompu ne laisse jamais de cache tronqué
+    tmp_path = cache_path.with_suffix(".tmp")
+    tmp_path.write_text(content, encoding="utf-8")
+    os.replace(tmp_path, cache_path)
+    return content
 
 def main():
     meta_path = "/home/wsl/workspace/meta_tft/meta.yaml"
@@ -203,17 +333,11 @@ def main():
         print(f"Trouvé {len(raw_comps)} compositions. Nettoyage via OpenAI...")
         
         new_yaml_content = generate_yaml_with_openai(raw_comps, cost_mapping)
-        
-        if new_yaml_content.startswith("```"):
-            new_yaml_content = "\n".join(new_yaml_content.split("\n")[1:-1])
-            
-        with open(meta_path, 'w', encoding='utf-8') as f:
-            f.write(new_yaml_content)
-            
-        # Post-nettoyage manuel de sécurité pour l'early_chercher
+
+        # Post-nettoyage manuel de sécurité pour l'early_chercher (en mémoire : une seule écriture disque)
+        output = new_yaml_content
         try:
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                final_data = yaml.safe_load(f)
+            final_data = yaml.load(new_yaml_content, Loader=SafeLoader)
             
             if final_data and 'meta' in final_data and 'champions_db' in final_data:
                 db = final_data['champions_db']
@@ -237,11 +361,13 @@ def main():
                         fallback = [c['name'] for c in comp.get('champions', []) if db.get(c['name'], {}).get('cost', 5) < 3]
                         comp['early_chercher'] = " / ".join(fallback[:3]) if fallback else "Early Units"
 
-                with open(meta_path, 'w', encoding='utf-8') as f:
-                    yaml.dump(final_data, f, allow_unicode=True, sort_keys=False)
+                output = yaml.dump(final_data, Dumper=SafeDumper, allow_unicode=True, sort_keys=False)
         except Exception as e:
             print(f"Erreur lors du post-nettoyage : {e}")
 
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+
         print("Mise à jour de meta.yaml réussie !")
         
     except Exception as e:
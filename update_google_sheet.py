@@ -6,19 +6,35 @@ Version corrigée avec structure de colonnes dynamique.
 
 import yaml
 import gspread
+from gspread.utils import absolute_range_name
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import os
+import hashlib
 import re
-import json
+import time
+import random
+import pickle
+import orjson
 from pathlib import Path
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Tuple
 import unicodedata
-import difflib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from rapidfuzz import fuzz, process
 from dotenv import load_dotenv
 
+# Loader YAML en C (libyaml) si disponible
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 # Charger les variables d'environnement
 load_dotenv()
 
@@ -35,6 +51,16 @@ CDRAGON_TFT_TEAMPLANNER_URL = (
     "https://raw.communitydragon.org/latest/plugins/rcp-be-lol-game-data/global/default/v1/tftchampions-teamplanner.json"
 )
 
+# Session partagée : keep-alive entre les hôtes DDragon / CDragon, réponses compressées,
+# et nouvelles tentatives sur les erreurs réseau / 429 / 5xx transitoires
+_SESSION = requests.Session()
+_SESSION.headers.update({"Accept-Encoding": "gzip, deflate", "User-Agent": "meta_tft/1.0"})
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504)),
+))
+
 # Mini table FR -> EN pour éviter des "erreurs bêtes" quand le YAML est en français.
 # (On garde volontairement petit; tu peux l'étendre si besoin.)
 ITEM_ALIASES: Dict[str, str] = {
@@ -59,12 +85,26 @@ ITEM_ALIASES: Dict[str, str] = {
 }
 
 
-_MISSING_ITEMS_LOGGED: set[str] = set()
+# Statuts Sheets API transitoires (quota / erreurs serveur) qui valent une nouvelle tentative
+SHEETS_RETRY_STATUSES = (429, 500, 502, 503, 504)
 
 def load_yaml(file_path: str) -> Dict[str, Any]:
-    """Charge le fichier YAML."""
+    """Charge le fichier YAML (copie pickle en cache tant que le fichier n'a pas changé)."""
+    st = os.stat(file_path)
+    key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+    cache_path = _cache_dir() / f"{Path(file_path).name}.pickle"
+    if cache_path.exists():
+        try:
+            cached_key, data = pickle.loads(cache_path.read_bytes())
+            if cached_key == key:
+                return data
+        except Exception:
+            pass  # cache illisible : on reparse le YAML
+
     with open(file_path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+        data = yaml.load(f, Loader=SafeLoader)
+    cache_path.write_bytes(pickle.dumps((key, data), protocol=pickle.HIGHEST_PROTOCOL))
+    return data
 
 def init_google_sheets(credentials_file: str = "credentials.json") -> Tuple[gspread.Client, Any, Any]:
     """Initialise la connexion à Google Sheets."""
@@ -76,47 +116,122 @@ def init_google_sheets(credentials_file: str = "credentials.json") -> Tuple[gspr
     
     creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPE)
     client = gspread.authorize(creds)
-    service = build('sheets', 'v4', credentials=creds)
+    # Document de discovery embarqué dans google-api-python-client : pas d'aller-retour HTTP
+    # ni de cache fichier (oauth2client absent) au démarrage
+    service = build('sheets', 'v4', credentials=creds, static_discovery=True, cache_discovery=False)
     return client, service
 
 
+def _retry(fn, *, tries: int = 5, base: float = 1.0):
+    """Relance un appel Sheets sur 429/5xx avec un backoff exponentiel (+ jitter)."""
+    for attempt in range(tries):
+        try:
+            return fn()
+        except (HttpError, gspread.exceptions.APIError) as e:
+            status = e.resp.status if isinstance(e, HttpError) else e.response.status_code
+            if status not in SHEETS_RETRY_STATUSES or attempt == tries - 1:
+                raise
+            delay = base * 2 ** attempt + random.random()
+            print(f"⏳ Sheets API {status}, nouvelle tentative dans {delay:.1f}s...")
+            time.sleep(delay)
+
+
 def _cache_dir() -> Path:
     p = Path(".cache") / "meta_tft"
     p.mkdir(parents=True, exist_ok=True)
     return p
 
 
+def _missing_items_path() -> Path:
+    return _cache_dir() / "missing_items.json"
+
+
+@lru_cache(maxsize=1)
+def _missing_items_logged() -> set:
+    """Items sans icône déjà signalés, persistés pour ne pas les re-logger à chaque exécution."""
+    try:
+        return set(orjson.loads(_missing_items_path().read_bytes()))
+    except (OSError, orjson.JSONDecodeError, TypeError):
+        # Absent ou tronqué (run interrompu) : on repart d'une liste vide
+        return set()
+
+
+_NONALNUM_RE = re.compile(r"[^a-z0-9]+")
+_QUOTE_TABLE = str.maketrans({"’": "'", "`": "'"})
+# Diacritiques combinants (accents) laissés par la décomposition Unicode
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]")
+# Accents français courants -> lettre de base, en une seule passe str.translate (en C)
+_ACCENT_MAP = str.maketrans({
+    c: unicodedata.normalize("NFKD", c)[0] for c in "àâäéèêëîïôöùûüÿçÀÂÄÉÈÊËÎÏÔÖÙÛÜŸÇ"
+})
+
+
 def _strip_accents(s: str) -> str:
-    return "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
+    # Les noms EN (la grande majorité) sont déjà en ASCII : rien à normaliser
+    if s.isascii():
+        return s
+    # Cas FR typique : la table suffit, pas besoin de la décomposition NFKD
+    s = s.translate(_ACCENT_MAP)
+    if s.isascii():
+        return s
+    return _COMBINING_RE.sub("", unicodedata.normalize("NFKD", s))
 
 
+@lru_cache(maxsize=8192)
 def _norm_key(s: str) -> str:
     if s is None:
         return ""
     s = str(s).strip()
-    s = s.replace("’", "'").replace("`", "'")
+    s = s.translate(_QUOTE_TABLE)
     s = _strip_accents(s)
     s = s.lower()
     # garde alphanum uniquement (supprime espaces, apostrophes, tirets, etc.)
-    s = re.sub(r"[^a-z0-9]+", "", s)
+    s = _NONALNUM_RE.sub("", s)
     return s
 
 
+def _http_get_json_cached(url: str, cache_path: Path, timeout: int = 30) -> Any:
+    """
+    GET conditionnel (If-None-Match / If-Modified-Since) : le corps JSON est gardé
+    en cache avec son ETag / Last-Modified et réutilisé tel quel sur un 304.
+    """
+    cached = _load_json(cache_path)
+    headers = {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        response = _SESSION.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and "body" in cached:
+            return cached["body"]
+        # 403/404... : ne jamais mettre en cache (ni parser) une page d'erreur
+        response.raise_for_status()
+    except requests.RequestException:
+        # Hors ligne ou erreur HTTP : mieux vaut un cache un peu ancien que rien
+        if "body" in cached:
+            return cached["body"]
+        raise
+
+    body = orjson.loads(response.content)
+    _save_json(cache_path, {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "body": body,
+    })
+    return body
+
+
+@lru_cache(maxsize=None)
 def _dd_latest_version() -> str:
     """
-    Récupère la dernière version Data Dragon (cache local).
+    Récupère la dernière version Data Dragon (revalidée via ETag à chaque exécution).
     """
-    cache_path = _cache_dir() / "dd_latest_version.txt"
-    if cache_path.exists():
-        v = cache_path.read_text(encoding="utf-8").strip()
-        if v:
-            return v
-    versions = requests.get(DD_VERSIONS_URL, timeout=30).json()
-    v = versions[0]
-    cache_path.write_text(v, encoding="utf-8")
-    return v
+    versions = _http_get_json_cached(DD_VERSIONS_URL, _cache_dir() / "dd_versions.json")
+    return versions[0]
 
 
+@lru_cache(maxsize=None)
 def _dd_lol_champion_index(version: str) -> Dict[str, str]:
     """
     Retourne un mapping normalisé -> champion_id (ex: 'missfortune' -> 'MissFortune')
@@ -124,10 +239,10 @@ def _dd_lol_champion_index(version: str) -> Dict[str, str]:
     """
     cache_path = _cache_dir() / f"dd_champion_index_{version}.json"
     if cache_path.exists():
-        return json.loads(cache_path.read_text(encoding="utf-8"))
+        return orjson.loads(cache_path.read_bytes())
 
     url = f"{DD_CDN_BASE}/{version}/data/en_US/champion.json"
-    data = requests.get(url, timeout=30).json()
+    data = orjson.loads(_SESSION.get(url, timeout=30).content)
     champs = (data or {}).get("data") or {}
     idx: Dict[str, str] = {}
     for _, c in champs.items():
@@ -140,22 +255,20 @@ def _dd_lol_champion_index(version: str) -> Dict[str, str]:
         if isinstance(champ_name, str) and isinstance(champ_id, str):
             idx[_norm_key(champ_name)] = champ_id
 
-    cache_path.write_text(json.dumps(idx, ensure_ascii=False), encoding="utf-8")
+    cache_path.write_bytes(orjson.dumps(idx))
     return idx
 
 
+@lru_cache(maxsize=None)
 def _tft_name_to_character_id() -> Dict[str, str]:
     """
     Mapping display_name TFT -> character_id (ex: 'Kennen' -> 'TFT16_Kennen')
-    via CommunityDragon teamplanner. Cache local.
+    via CommunityDragon teamplanner ("latest" : revalidé via ETag à chaque exécution).
     """
     forced_set = os.getenv("TFT_SET_KEY", "").strip()
-    cache_suffix = forced_set if forced_set else "ALL"
-    cache_path = _cache_dir() / f"tft_name_to_character_id_{cache_suffix}.json"
-    if cache_path.exists():
-        return json.loads(cache_path.read_text(encoding="utf-8"))
-
-    raw = requests.get(CDRAGON_TFT_TEAMPLANNER_URL, timeout=45).json()
+    raw = _http_get_json_cached(
+        CDRAGON_TFT_TEAMPLANNER_URL, _cache_dir() / "cdragon_tftchampions_teamplanner.json", timeout=45
+    )
     idx: Dict[str, str] = {}
     if isinstance(raw, dict):
         items = raw.items()
@@ -172,11 +285,31 @@ def _tft_name_to_character_id() -> Dict[str, str]:
                 cid = e.get("character_id")
                 if isinstance(name, str) and isinstance(cid, str):
                     idx[_norm_key(name)] = cid
-
-    cache_path.write_text(json.dumps(idx, ensure_ascii=False), encoding="utf-8")
     return idx
 
 
+def warm_caches() -> None:
+    """
+    Précharge en parallèle les index Data Dragon / CDragon (requêtes I/O indépendantes),
+    pour que les get_*_image_url ne touchent plus que des dicts en mémoire.
+    """
+    try:
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            fut_tft = ex.submit(_tft_name_to_character_id)
+            ver = _dd_latest_version()
+            futures = [
+                fut_tft,
+                ex.submit(_dd_lol_champion_index, ver),
+                ex.submit(_dd_tft_item_index, ver),
+            ]
+            for fut in futures:
+                fut.result()
+    except Exception as e:
+        # Non bloquant : les index seront rechargés à la demande
+        print(f"⚠️  Préchargement des index impossible: {e}")
+
+
+@lru_cache(maxsize=4096)
 def get_champion_image_url(champion: str) -> str:
     """
     Construit dynamiquement l'URL d'icône champion.
@@ -203,16 +336,17 @@ def get_champion_image_url(champion: str) -> str:
     return ""
 
 
+@lru_cache(maxsize=None)
 def _dd_tft_item_index(version: str) -> Dict[str, str]:
     """
     Mapping normalisé nom d'item -> image.full (png) à partir de tft-item.json.
     """
     cache_path = _cache_dir() / f"dd_tft_item_index_{version}.json"
     if cache_path.exists():
-        return json.loads(cache_path.read_text(encoding="utf-8"))
+        return orjson.loads(cache_path.read_bytes())
 
     url = f"{DD_CDN_BASE}/{version}/data/en_US/tft-item.json"
-    data = requests.get(url, timeout=30).json()
+    data = orjson.loads(_SESSION.get(url, timeout=30).content)
     items = (data or {}).get("data") or {}
     idx: Dict[str, str] = {}
     for _, it in items.items():
@@ -228,10 +362,24 @@ def _dd_tft_item_index(version: str) -> Dict[str, str]:
         if isinstance(it_id, str) and isinstance(full, str):
             idx[_norm_key(it_id)] = full
 
-    cache_path.write_text(json.dumps(idx, ensure_ascii=False), encoding="utf-8")
+    cache_path.write_bytes(orjson.dumps(idx))
     return idx
 
 
+@lru_cache(maxsize=None)
+def _dd_tft_item_keys(version: str) -> Tuple[str, ...]:
+    """Clés de l'index items, figées une fois pour le fuzzy match."""
+    return tuple(_dd_tft_item_index(version))
+
+
+@lru_cache(maxsize=None)
+def _dd_tft_item_lookup(version: str) -> Dict[str, str]:
+    """Nom ou ID d'item normalisé -> URL d'icône complète, construite une fois par version."""
+    base = f"{DD_CDN_BASE}/{version}/img/tft-item/"
+    return {k: base + full for k, full in _dd_tft_item_index(version).items()}
+
+
+@lru_cache(maxsize=4096)
 def get_item_image_url(item_name: str) -> str:
     """
     Construit dynamiquement l'URL d'icône item TFT via Data Dragon (tft-item),
@@ -245,24 +393,33 @@ def get_item_image_url(item_name: str) -> str:
     name = ITEM_ALIASES.get(name, name)
 
     ver = _dd_latest_version()
-    idx = _dd_tft_item_index(ver)
+    lookup = _dd_tft_item_lookup(ver)
     k = _norm_key(name)
-    full = idx.get(k)
-    if not full:
+    url = lookup.get(k)
+    if not url:
         # Fallback: tentative "fuzzy match" (utile quand le YAML a des variations de noms).
         # Exemple: "Giant Slayer" existe mais l'ID TFT est différent; "Rédemption" est un cas spécial, etc.
-        matches = difflib.get_close_matches(k, list(idx.keys()), n=1, cutoff=0.88)
-        if matches:
-            full = idx.get(matches[0])
-    if not full:
-        # Log une seule fois par item pour aider à nettoyer meta.yaml
-        if name not in _MISSING_ITEMS_LOGGED:
-            _MISSING_ITEMS_LOGGED.add(name)
+        # Vaut aussi pour les IDs TFT_* (ex: TFT_Item_GuardianAngel -> TFT5_Item_GuardianAngel)
+        match = process.extractOne(k, _dd_tft_item_keys(ver), scorer=fuzz.ratio, score_cutoff=88)
+        if match:
+            url = lookup.get(match[0])
+    if not url:
+        # Log une seule fois par item pour aider à nettoyer meta.yaml (liste gardée dans le cache)
+        logged = _missing_items_logged()
+        before = len(logged)
+        logged.add(name)
+        if len(logged) != before:
             print(f"⚠️  Item introuvable (pas d'icône): {name!r}")
+            # Écriture atomique : un run interrompu ne laisse pas de fichier tronqué
+            path = _missing_items_path()
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(orjson.dumps(sorted(logged)))
+            os.replace(tmp_path, path)
         return ""
-    return f"{DD_CDN_BASE}/{ver}/img/tft-item/{full}"
+    return url
 
 
+@lru_cache(maxsize=4096)
 def get_synergy_image_url(synergy_name: str) -> str:
     """
     Construit l'URL de l'icône de synergie via MetaTFT.
@@ -276,33 +433,49 @@ def get_synergy_image_url(synergy_name: str) -> str:
 
 
 def _load_json(path: Path) -> Dict[str, Any]:
-    if not path.exists():
+    try:
+        return orjson.loads(path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        # Absent ou tronqué (run interrompu) : cache vide
         return {}
-    return json.loads(path.read_text(encoding="utf-8"))
 
 
 def _save_json(path: Path, obj: Dict[str, Any]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Écriture atomique : un run interrompu ne laisse pas de fichier tronqué
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    os.replace(tmp_path, path)
+
 
+_NAME_SEP_RE = re.compile(r"[/,]")
 
-def parse_champion_names(text: str) -> List[str]:
-    """Parse une chaîne de texte pour extraire les noms de champions."""
+@lru_cache(maxsize=2048)
+def parse_champion_names(text: str) -> Tuple[str, ...]:
+    """Parse une chaîne de texte pour extraire les noms de champions (séparés par / ou ,)."""
     if not text:
-        return []
-    for separator in ["/", ","]:
-        if separator in text:
-            return [c.strip() for c in text.split(separator) if c.strip()]
-    return [text.strip()] if text.strip() else []
+        return ()
+    return tuple(c.strip() for c in _NAME_SEP_RE.split(text) if c.strip())
+
+# Gabarits de formules IMAGE() et chaînes d'étoiles précalculées (1 à 4 étoiles)
+_IMG = '=IMAGE("{}")'
+_IMG_SIZED = '=IMAGE("{}"; 4; {s}; {s})'
+_STARS = ("", "⭐", "⭐⭐", "⭐⭐⭐", "⭐⭐⭐⭐")
 
 def create_image_formula(url: str, size: int = None) -> str:
     """Crée une formule IMAGE() pour Google Sheets avec une taille optionnelle."""
     if size:
-        return f'=IMAGE("{url}"; 4; {size}; {size})'
-    return f'=IMAGE("{url}")'
+        return _IMG_SIZED.format(url, s=size)
+    return _IMG.format(url)
 
-def col_num_to_letter(col_num: int) -> str:
-    """Convertit un numéro de colonne (1-indexed) en lettre de colonne (A, B, C, etc.)."""
+def _trim_row(row: List[str]) -> List[str]:
+    """Retire les cellules vides en fin de ligne."""
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row[:end]
+
+def _col_letters(col_num: int) -> str:
     result = ""
     while col_num > 0:
         col_num -= 1
@@ -310,19 +483,51 @@ def col_num_to_letter(col_num: int) -> str:
         col_num //= 26
     return result
 
+# Lettres précalculées pour les colonnes 1..702 (A..ZZ) ; index 0 = ""
+_COL_LETTERS = tuple(_col_letters(i) for i in range(703))
+
+def col_num_to_letter(col_num: int) -> str:
+    """Convertit un numéro de colonne (1-indexed) en lettre de colonne (A, B, C, etc.)."""
+    if 0 <= col_num < len(_COL_LETTERS):
+        return _COL_LETTERS[col_num]
+    return _col_letters(col_num)
+
+_SHEET_ID_RE = re.compile(r'^[a-zA-Z0-9_-]{30,}$')
+_SHEET_URL_RE = re.compile(r'/spreadsheets/d/([a-zA-Z0-9_-]+)')
+_SHEET_ID_PREFIX_RE = re.compile(r'^([a-zA-Z0-9_-]{30,})[/?#]')
+
 def extract_sheet_id(sheet_input: str) -> str:
     """Extrait l'ID du Google Sheet depuis une URL ou retourne l'ID directement."""
     sheet_input = sheet_input.strip()
-    if re.match(r'^[a-zA-Z0-9_-]{30,}$', sheet_input):
+    if _SHEET_ID_RE.match(sheet_input):
         return sheet_input
-    match = re.search(r'/spreadsheets/d/([a-zA-Z0-9_-]+)', sheet_input)
+    match = _SHEET_URL_RE.search(sheet_input)
     if match:
         return match.group(1)
-    match = re.match(r'^([a-zA-Z0-9_-]{30,})[/?#]', sheet_input)
+    match = _SHEET_ID_PREFIX_RE.match(sheet_input)
     if match:
         return match.group(1)
     return sheet_input
 
+# Couleurs des blocs, calculées une fois à l'import
+# Fond des cellules champions/items selon le coût en gold
+_COST_BG_COLORS = {
+    1: {"red": 40/255, "green": 55/255, "blue": 75/255}, # Slate-700
+    2: {"red": 6/255, "green": 78/255, "blue": 59/255},  # Emerald-900 (Vert)
+    3: {"red": 30/255, "green": 58/255, "blue": 138/255}, # Blue-900 (Bleu)
+    4: {"red": 88/255, "green": 28/255, "blue": 135/255}, # Purple-900 (Violet)
+    5: {"red": 120/255, "green": 53/255, "blue": 15/255},  # Amber-900 (Or)
+}
+_SLATE_50 = {"red": 248/255, "green": 250/255, "blue": 252/255}  # texte clair
+_SLATE_200 = {"red": 226/255, "green": 232/255, "blue": 240/255} # texte A..D
+_SLATE_600 = {"red": 71/255, "green": 85/255, "blue": 105/255}   # pointillés internes
+_SLATE_700 = {"red": 51/255, "green": 65/255, "blue": 85/255}    # séparation de blocs
+# Fond alterné des blocs (A..D) : Slate-800 / Slate-900
+_BLOCK_BG_COLORS = (
+    {"red": 30/255, "green": 41/255, "blue": 59/255},
+    {"red": 15/255, "green": 23/255, "blue": 42/255},
+)
+
 def update_google_sheet(
     client: gspread.Client,
     service: Any,
@@ -331,56 +536,54 @@ def update_google_sheet(
     data: Dict[str, Any] = None
 ):
     """Met à jour le Google Sheet avec les données."""
+    # Index d'icônes chargés en parallèle avant de construire les lignes
+    warm_caches()
     try:
         spreadsheet = client.open_by_key(spreadsheet_id)
+        created_new = False
         try:
             worksheet = spreadsheet.worksheet(sheet_name)
         except gspread.WorksheetNotFound:
             worksheet = spreadsheet.add_worksheet(title=sheet_name, rows=100, cols=50)
+            created_new = True
         
         sheet_id = worksheet.id
         
-        # Redimensionner la feuille si nécessaire
-        try:
-            sheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-            sheet_props = None
-            for sheet in sheet_metadata.get('sheets', []):
-                if sheet['properties']['sheetId'] == sheet_id:
-                    sheet_props = sheet['properties']
-                    break
-            
-            if sheet_props:
-                current_cols = sheet_props.get('gridProperties', {}).get('columnCount', 0)
-                if current_cols < 50:
-                    requests = [{
-                        'updateSheetProperties': {
-                            'properties': {
-                                'sheetId': sheet_id,
-                                'gridProperties': {'rowCount': 100, 'columnCount': 50}
-                            },
-                            'fields': 'gridProperties'
-                        }
-                    }]
-                    service.spreadsheets().batchUpdate(
-                        spreadsheetId=spreadsheet_id,
-                        body={'requests': requests}
-                    ).execute()
-                    print(f"✅ Feuille redimensionnée à 50 colonnes")
-        except Exception as e:
-            print(f"⚠️  Erreur lors du redimensionnement: {e}")
-        
         # La nouvelle base de données des champions
         champions_db = data.get("champions_db", {})
         meta_list = data.get("meta", [])
         
-        worksheet.clear()
-
         # --- Structure "Excel-like" dans Google Sheets ---
         items_per_champ = 3
         
+        # 1er passage : enrichir et trier les champions de chaque compo via la DB,
+        # en relevant au passage le nombre max de champions et d'items par compo
+        # Tables coût / items construites une fois depuis la DB
+        cost_by_champ = {n: info.get("cost", 1) for n, info in champions_db.items()}
+        items_by_champ = {n: info.get("items", []) for n, info in champions_db.items()}
+
+        enriched_by_entry: List[List[Dict[str, Any]]] = []
+        max_items_by_entry: List[int] = []
+        max_champs_data = 0
+        for entry in meta_list:
+            enriched_champs = []
+            for c in entry.get("champions", []):
+                name = c["name"]
+                enriched_champs.append({
+                    "name": name,
+                    "cost": cost_by_champ.get(name, 1),
+                    "stars": c.get("stars", 2),
+                    "items": items_by_champ.get(name, ())
+                })
+            
+            # Tri forcé par coût
+            enriched_champs.sort(key=lambda x: x["cost"])
+            enriched_by_entry.append(enriched_champs)
+            max_items_by_entry.append(max((len(c["items"]) for c in enriched_champs), default=0))
+            max_champs_data = max(max_champs_data, len(enriched_champs))
+
         # On récupère le minimum du .env (floor) mais on ne limite pas le maximum (dynamique)
         min_champs_floor = int(os.getenv("META_MIN_CHAMPIONS", "8"))
-        max_champs_data = max([len(item.get("champions", [])) for item in meta_list], default=0)
         max_champs = max(max_champs_data, min_champs_floor)
         
         # Colonnes fixes (1-indexed)
@@ -393,7 +596,9 @@ def update_google_sheet(
         total_cols = col_champions_start + max_champs - 1
 
         # Construire les lignes à écrire
-        header = [""] * total_cols
+        # Ligne vide de référence : chaque ligne en est une copie
+        empty_row = [""] * total_cols
+        header = empty_row.copy()
         header[col_classement - 1] = "Classement méta"
         header[col_compo - 1] = "Compo"
         header[col_early - 1] = "Early à chercher"
@@ -404,29 +609,30 @@ def update_google_sheet(
         all_rows: List[List[str]] = [header]
         blocks: List[Tuple[int, int]] = []
 
-        current_row = 2  # 1-indexed (ligne dans Sheets)
-        for entry in meta_list:
-            champions_data = entry.get("champions", [])
-            
-            # Enrichir et trier les champions via la DB
-            enriched_champs = []
-            for c in champions_data:
-                name = c["name"]
-                db_info = champions_db.get(name, {})
-                enriched_champs.append({
-                    "name": name,
-                    "cost": db_info.get("cost", 1),
-                    "stars": c.get("stars", 2),
-                    "items": db_info.get("items", [])
-                })
-            
-            # Tri forcé par coût
-            enriched_champs.sort(key=lambda x: x["cost"])
-            enriched_champs = enriched_champs[:max_champs]
+        # URLs d'icônes résolues une seule fois par nom (champions / items affichés).
+        # Champions : simple lookup dans l'index teamplanner (revalidé à chaque exécution),
+        # donc jamais persistés. Items : résolutions réussies persistées par version DDragon
+        # (+ set TFT forcé) : un nouveau patch change le nom du fichier et invalide le cache.
+        set_key = os.getenv("TFT_SET_KEY", "").strip() or "ALL"
+        resolved_path = _cache_dir() / f"resolved_urls_{_dd_latest_version()}_{set_key}.json"
+        known_items = _load_json(resolved_path).get("items", {})
+        champ_urls = {
+            c["name"]: get_champion_image_url(c["name"])
+            for champs in enriched_by_entry for c in champs
+        }
+        item_urls = {
+            it: known_items.get(it) or get_item_image_url(it)
+            for champs in enriched_by_entry for c in champs for it in c["items"]
+        }
+        new_items = {k: v for k, v in item_urls.items() if v and k not in known_items}
+        if new_items:
+            _save_json(resolved_path, {"items": {**known_items, **new_items}})
+        # ... et leurs formules IMAGE() ("" si pas d'icône), prêtes à poser dans les lignes
+        champ_formulas = {ch: _IMG.format(u) if u else "" for ch, u in champ_urls.items()}
+        item_formulas = {it: _IMG.format(u) if u else "" for it, u in item_urls.items()}
 
-            # Calcul du max items pour la hauteur du bloc
-            max_items_in_comp = max((len(c["items"]) for c in enriched_champs), default=0)
-            
+        current_row = 2  # 1-indexed (ligne dans Sheets)
+        for entry, enriched_champs, max_items_in_comp in zip(meta_list, enriched_by_entry, max_items_by_entry):
             # Gestion des synergies (logos + noms)
             synergies_list = entry.get("synergies", [])
             if isinstance(synergies_list, str):
@@ -436,7 +642,7 @@ def update_google_sheet(
             block_height = max(2 + max_items_in_comp, len(synergies_list) * 2)
 
             # Ligne d'images (champions + 1ère synergie logo)
-            row_image = [""] * total_cols
+            row_image = empty_row.copy()
             row_image[col_classement - 1] = entry.get("classement", "")
             row_image[col_compo - 1] = entry.get("compo", "")
             row_image[col_early - 1] = entry.get("early_chercher", "")
@@ -444,21 +650,26 @@ def update_google_sheet(
             
             if synergies_list:
                 s_url = get_synergy_image_url(synergies_list[0])
-                row_image[col_synergies - 1] = create_image_formula(s_url, size=40) if s_url else ""
+                row_image[col_synergies - 1] = create_image_formula(s_url, 40) if s_url else ""
+
+            # Formules (portrait, items) de chaque champion de la compo, résolues une fois
+            champ_pack = [
+                (champ_formulas[c["name"]], [item_formulas[it] for it in c["items"]])
+                for c in enriched_champs
+            ]
 
             # Portraits champions
-            for idx, c in enumerate(enriched_champs):
-                url = get_champion_image_url(c["name"])
-                if url:
-                    row_image[col_champions_start - 1 + idx] = create_image_formula(url)
+            for idx, (portrait, _) in enumerate(champ_pack):
+                row_image[col_champions_start - 1 + idx] = portrait
 
             # Ligne de noms (+ 1ère synergie nom)
-            row_names = [""] * total_cols
+            row_names = empty_row.copy()
             if synergies_list:
                 row_names[col_synergies - 1] = synergies_list[0]
                 
             for idx, c in enumerate(enriched_champs):
-                stars_str = "⭐" * c["stars"]
+                stars = c["stars"]
+                stars_str = _STARS[stars] if 0 <= stars < len(_STARS) else "⭐" * stars
                 name_display = f"{c['name']}\n{stars_str}"
                 row_names[col_champions_start - 1 + idx] = name_display
 
@@ -466,7 +677,7 @@ def update_google_sheet(
 
             # Lignes d'extra (Items et synergies additionnelles)
             for r in range(block_height - 2):
-                row_extra = [""] * total_cols
+                row_extra = empty_row.copy()
                 
                 # Synergies suivantes
                 syn_idx = (r + 2) // 2
@@ -476,14 +687,12 @@ def update_google_sheet(
                         row_extra[col_synergies - 1] = synergies_list[syn_idx]
                     else:
                         s_url = get_synergy_image_url(synergies_list[syn_idx])
-                        row_extra[col_synergies - 1] = create_image_formula(s_url, size=40) if s_url else ""
+                        row_extra[col_synergies - 1] = create_image_formula(s_url, 40) if s_url else ""
                 
                 # Items champions
-                for idx, c in enumerate(enriched_champs):
-                    if r < len(c["items"]):
-                        item_url = get_item_image_url(c["items"][r])
-                        if item_url:
-                            row_extra[col_champions_start - 1 + idx] = create_image_formula(item_url)
+                for idx, (_, items_f) in enumerate(champ_pack):
+                    if r < len(items_f):
+                        row_extra[col_champions_start - 1 + idx] = items_f[r]
                 
                 comp_rows.append(row_extra)
 
@@ -491,48 +700,25 @@ def update_google_sheet(
             blocks.append((current_row, block_height, enriched_champs))
             current_row += block_height
 
-        # S'assurer que la feuille a assez de lignes/colonnes
+        # Agrandir la feuille jusqu'à la zone stylée, sans jamais la rétrécir (les lignes /
+        # colonnes au-delà seraient supprimées) : gspread connaît déjà la taille actuelle.
         needed_rows = len(all_rows)
         needed_cols = total_cols
-        try:
-            sheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-            sheet_props = None
-            for s in sheet_metadata.get("sheets", []):
-                if s["properties"]["sheetId"] == sheet_id:
-                    sheet_props = s["properties"]
-                    break
-            if sheet_props:
-                gp = sheet_props.get("gridProperties", {})
-                cur_r = gp.get("rowCount", 100)
-                cur_c = gp.get("columnCount", 26)
-                if cur_r < needed_rows or cur_c < needed_cols:
-                    service.spreadsheets().batchUpdate(
-                        spreadsheetId=spreadsheet_id,
-                        body={
-                            "requests": [
-                                {
-                                    "updateSheetProperties": {
-                                        "properties": {
-                                            "sheetId": sheet_id,
-                                            "gridProperties": {
-                                                "rowCount": max(cur_r, needed_rows),
-                                                "columnCount": max(cur_c, needed_cols),
-                                            },
-                                        },
-                                        "fields": "gridProperties",
-                                    }
-                                }
-                            ]
-                        },
-                    ).execute()
-        except Exception as e:
-            print(f"⚠️  Redimensionnement lignes/colonnes ignoré: {e}")
-
-        # Écriture (texte + formules IMAGE)
-        worksheet.update(range_name="A1", values=all_rows, value_input_option="USER_ENTERED")
+        style_rows = max(needed_rows + 50, 100)
+        style_cols = max(needed_cols + 10, 50)
+        grid_rows = max(worksheet.row_count, style_rows)
+        grid_cols = max(worksheet.col_count, style_cols)
 
-        # Style + merges + tailles
-        requests: List[Dict[str, Any]] = []
+        # Style + merges + tailles (un seul batchUpdate, redimensionnement en tête)
+        requests: List[Dict[str, Any]] = [{
+            "updateSheetProperties": {
+                "properties": {
+                    "sheetId": sheet_id,
+                    "gridProperties": {"rowCount": grid_rows, "columnCount": grid_cols},
+                },
+                "fields": "gridProperties(rowCount,columnCount)",
+            }
+        }]
 
         # --- STYLE GLOBAL (FOND SOMBRE POUR TOUTE LA FEUILLE) ---
         requests.append({
@@ -540,9 +726,9 @@ def update_google_sheet(
                 "range": {
                     "sheetId": sheet_id,
                     "startRowIndex": 0,
-                    "endRowIndex": max(needed_rows + 50, 100),
+                    "endRowIndex": style_rows,
                     "startColumnIndex": 0,
-                    "endColumnIndex": max(needed_cols + 10, 50),
+                    "endColumnIndex": style_cols,
                 },
                 "cell": {
                     "userEnteredFormat": {
@@ -558,18 +744,14 @@ def update_google_sheet(
         })
 
         # IMPORTANT: worksheet.clear() n'enlève pas les fusions existantes.
-        # On unfuse toute la zone utilisée avant de re-fusionner.
-        requests.append({
-            "unmergeCells": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "startRowIndex": 0,
-                    "endRowIndex": max(needed_rows, 1000),
-                    "startColumnIndex": 0,
-                    "endColumnIndex": max(needed_cols, 26),
+        # On unfuse toute la feuille (plage sans bornes) avant de re-fusionner
+        # (sauf sur un onglet tout juste créé, qui n'en a aucune).
+        if not created_new:
+            requests.append({
+                "unmergeCells": {
+                    "range": {"sheetId": sheet_id}
                 }
-            }
-        })
+            })
 
         # Header styling (row 1)
         def _repeat_header(start_col0: int, end_col0: int, rgb: Tuple[int, int, int], text_rgb: Tuple[int, int, int] = (255, 255, 255)) -> None:
@@ -699,10 +881,27 @@ def update_google_sheet(
                 }
             })
 
+        # Hauteur commune des lignes de blocs (noms + items : 50px) en une seule plage ;
+        # seules les lignes d'images (80px) sont ensuite ajustées bloc par bloc.
+        if needed_rows > 1:
+            requests.append({
+                "updateDimensionProperties": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "ROWS",
+                        "startIndex": 1,
+                        "endIndex": needed_rows,
+                    },
+                    "properties": {"pixelSize": 50},
+                    "fields": "pixelSize",
+                }
+            })
+
         # Blocks formatting + merges
-        for block_idx, (row_start, height, enriched_champs) in enumerate(blocks):
+        # Fond alterné par bloc (A..D : à partir de E, le fond Slate-950 ci-dessous recouvre tout)
+        for block_idx, (row_start, height, _) in enumerate(blocks):
             # Alternance subtile de bleu sombre (Slate-800 vs Slate-900)
-            bg = {"red": 30/255, "green": 41/255, "blue": 59/255} if (block_idx % 2 == 0) else {"red": 15/255, "green": 23/255, "blue": 42/255}
+            bg = _BLOCK_BG_COLORS[block_idx % 2]
 
             # Style pour le bloc entier (fond par défaut)
             requests.append({
@@ -712,25 +911,26 @@ def update_google_sheet(
                         "startRowIndex": row_start - 1,
                         "endRowIndex": row_start - 1 + height,
                         "startColumnIndex": 0,
-                        "endColumnIndex": total_cols,
+                        "endColumnIndex": 4,
                     },
                     "cell": {
                         "userEnteredFormat": {
                             "backgroundColor": bg,
-                            "textFormat": {"foregroundColor": {"red": 226/255, "green": 232/255, "blue": 240/255}} # Slate-200
+                            "textFormat": {"foregroundColor": _SLATE_200}
                         }
                     },
                     "fields": "userEnteredFormat(backgroundColor,textFormat)",
                 }
             })
 
-            # --- FOCUS CLASSEMENT (Colonne A) : Texte Doré/Or ---
+        if blocks:
+            # --- FOCUS CLASSEMENT (Colonne A) : Texte Doré/Or --- (tous les blocs d'un coup)
             requests.append({
                 "repeatCell": {
                     "range": {
                         "sheetId": sheet_id,
-                        "startRowIndex": row_start - 1,
-                        "endRowIndex": row_start - 1 + height,
+                        "startRowIndex": 1,
+                        "endRowIndex": needed_rows,
                         "startColumnIndex": 0,
                         "endColumnIndex": 1,
                     },
@@ -747,20 +947,20 @@ def update_google_sheet(
                 }
             })
 
-            # --- FOCUS SYNERGIES (Colonne E) : Fond Slate-950 (Plus sombre) ---
+            # --- FOCUS SYNERGIES (Colonne E) : Fond Slate-950 (Plus sombre) --- (tous les blocs d'un coup)
             requests.append({
                 "repeatCell": {
                     "range": {
                         "sheetId": sheet_id,
-                        "startRowIndex": row_start - 1,
-                        "endRowIndex": row_start - 1 + height,
+                        "startRowIndex": 1,
+                        "endRowIndex": needed_rows,
                         "startColumnIndex": 4, # Colonne E
                     },
                     "cell": {
                         "userEnteredFormat": {
                             "backgroundColor": {"red": 2/255, "green": 6/255, "blue": 23/255}, # Slate-950
                             "textFormat": {
-                                "foregroundColor": {"red": 248/255, "green": 250/255, "blue": 252/255}, # Slate-50
+                                "foregroundColor": _SLATE_50,
                                 "bold": True,
                                 "fontSize": 10 # Remonté à 10px car la colonne est plus large
                             }
@@ -770,70 +970,28 @@ def update_google_sheet(
                 }
             })
 
-            # --- FOCUS CHAMPIONS/ITEMS (Colonnes F+) : Couleur selon le prix en gold (CELLULE PAR CELLULE) ---
-            COST_BG_COLORS = {
-                1: {"red": 40/255, "green": 55/255, "blue": 75/255}, # Slate-700
-                2: {"red": 6/255, "green": 78/255, "blue": 59/255},  # Emerald-900 (Vert)
-                3: {"red": 30/255, "green": 58/255, "blue": 138/255}, # Blue-900 (Bleu)
-                4: {"red": 88/255, "green": 28/255, "blue": 135/255}, # Purple-900 (Violet)
-                5: {"red": 120/255, "green": 53/255, "blue": 15/255},  # Amber-900 (Or)
-            }
-            
-            for idx, c in enumerate(enriched_champs):
-                bg_color = COST_BG_COLORS.get(c["cost"], COST_BG_COLORS[1])
-                
-                # Image champion
+        for row_start, height, enriched_champs in blocks:
+            # --- FOCUS CHAMPIONS/ITEMS (Colonnes F+) : Couleur selon le prix en gold ---
+            tiers = [c["cost"] if c["cost"] in _COST_BG_COLORS else 1 for c in enriched_champs]
+
+            # Image + items : un seul updateCells par bloc avec le fond de chaque colonne ;
+            # la ligne de noms (2e ligne) est envoyée vide et garde son fond
+            if tiers:
+                cost_row = {"values": [
+                    {"userEnteredFormat": {"backgroundColor": _COST_BG_COLORS[tier]}}
+                    for tier in tiers
+                ]}
                 requests.append({
-                    "repeatCell": {
-                        "range": {
+                    "updateCells": {
+                        "rows": [cost_row, {}] + [cost_row] * (height - 2),
+                        "fields": "userEnteredFormat.backgroundColor",
+                        "start": {
                             "sheetId": sheet_id,
-                            "startRowIndex": row_start - 1,
-                            "endRowIndex": row_start,
-                            "startColumnIndex": col_champions_start - 1 + idx,
-                            "endColumnIndex": col_champions_start + idx,
+                            "rowIndex": row_start - 1,
+                            "columnIndex": col_champions_start - 1,
                         },
-                        "cell": {"userEnteredFormat": {"backgroundColor": bg_color}},
-                        "fields": "userEnteredFormat(backgroundColor)",
                     }
                 })
-                # Items
-                if height > 2:
-                    requests.append({
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": sheet_id,
-                                "startRowIndex": row_start + 1,
-                                "endRowIndex": row_start - 1 + height,
-                                "startColumnIndex": col_champions_start - 1 + idx,
-                                "endColumnIndex": col_champions_start + idx,
-                            },
-                            "cell": {"userEnteredFormat": {"backgroundColor": bg_color}},
-                    "fields": "userEnteredFormat(backgroundColor)",
-                }
-            })
-
-            # --- FOCUS NOMS CHAMPIONS (Ligne 2 du bloc) : Texte plus petit et info étoiles ---
-            requests.append({
-                "repeatCell": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "startRowIndex": row_start, # Ligne des noms
-                        "endRowIndex": row_start + 1,
-                        "startColumnIndex": 5, # Champions start
-                        "endColumnIndex": total_cols,
-                    },
-                    "cell": {
-                        "userEnteredFormat": {
-                            "textFormat": {
-                                "foregroundColor": {"red": 248/255, "green": 250/255, "blue": 252/255}, # Slate-50
-                                "fontSize": 10, # Taille légèrement augmentée pour lisibilité
-                                "bold": False # Pas de gras
-                            }
-                        }
-                    },
-                    "fields": "userEnteredFormat(textFormat)",
-                }
-            })
 
             # Bordures de séparation de bloc (Ligne discrète Slate-700)
             requests.append({
@@ -845,13 +1003,16 @@ def update_google_sheet(
                         "startColumnIndex": 0,
                         "endColumnIndex": total_cols,
                     },
-                    "bottom": {"style": "SOLID", "width": 1, "color": {"red": 51/255, "green": 65/255, "blue": 85/255}}, # Slate-700
-                    "innerHorizontal": {"style": "DOTTED", "color": {"red": 71/255, "green": 85/255, "blue": 105/255}}, # Slate-600
+                    "bottom": {"style": "SOLID", "width": 1, "color": _SLATE_700},
+                    "innerHorizontal": {"style": "DOTTED", "color": _SLATE_600},
                 }
             })
 
             # Row heights within block (PLUS COMPACT)
-            # image row (champion)
+            # image row (champion) ; noms + items sont couverts par la hauteur commune plus haut.
+            # Sans portrait, le logo de synergie (40px) tient dans la hauteur commune.
+            if not enriched_champs:
+                continue
             requests.append({
                 "updateDimensionProperties": {
                     "range": {
@@ -864,90 +1025,57 @@ def update_google_sheet(
                     "fields": "pixelSize",
                 }
             })
-            # name row (champion + stars) - ON NE LE RÉDUIT PAS
+
+        # --- FOCUS NOMS CHAMPIONS (Ligne 2 du bloc) : Texte plus petit et info étoiles ---
+        # Un seul updateCells depuis la 1re ligne de noms : les lignes intermédiaires
+        # sont envoyées vides (aucune cellule écrite), seules les lignes de noms reçoivent le format.
+        # index 0 des lignes de noms, hors compos sans champion
+        names_rows = [row_start for row_start, _, champs in blocks if champs]
+        if names_rows:
+            names_cells = [{
+                "userEnteredFormat": {
+                    "textFormat": {
+                        "foregroundColor": _SLATE_50,
+                        "fontSize": 10, # Taille légèrement augmentée pour lisibilité
+                        "bold": False # Pas de gras
+                    }
+                }
+            }] * (total_cols - (col_champions_start - 1))
+            first_names, last_names = names_rows[0], names_rows[-1]
+            names_rows = set(names_rows)
             requests.append({
-                "updateDimensionProperties": {
-                    "range": {
+                "updateCells": {
+                    "rows": [
+                        {"values": names_cells} if r in names_rows else {}
+                        for r in range(first_names, last_names + 1)
+                    ],
+                    "fields": "userEnteredFormat.textFormat",
+                    "start": {
                         "sheetId": sheet_id,
-                        "dimension": "ROWS",
-                        "startIndex": row_start,
-                        "endIndex": row_start + 1,
+                        "rowIndex": first_names,
+                        "columnIndex": col_champions_start - 1,
                     },
-                    "properties": {"pixelSize": 50}, # Ajusté pour bien voir les étoiles
-                    "fields": "pixelSize",
                 }
             })
-            # item rows (if any)
-            if height > 2:
-                requests.append({
-                    "updateDimensionProperties": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "dimension": "ROWS",
-                            "startIndex": row_start + 1,
-                            "endIndex": row_start - 1 + height,
-                        },
-                        "properties": {"pixelSize": 50}, # Réduit de 70 à 50
-                        "fields": "pixelSize",
-                    }
-                })
 
-            # Merge vertical A..D for the block (no empty under compo)
-            for col_idx in range(0, 4):
-                requests.append({
-                    "mergeCells": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "startRowIndex": row_start - 1,
-                            "endRowIndex": row_start - 1 + height,
-                            "startColumnIndex": col_idx,
-                            "endColumnIndex": col_idx + 1,
-                        },
-                        "mergeType": "MERGE_ALL",
-                    }
-                })
-                # Center text in merged cell
-                requests.append({
-                    "repeatCell": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "startRowIndex": row_start - 1,
-                            "endRowIndex": row_start - 1 + height,
-                            "startColumnIndex": col_idx,
-                            "endColumnIndex": col_idx + 1,
-                        },
-                        "cell": {
-                            "userEnteredFormat": {
-                                "horizontalAlignment": "CENTER",
-                                "verticalAlignment": "MIDDLE",
-                                "wrapStrategy": "WRAP",
-                            }
-                        },
-                        "fields": "userEnteredFormat(horizontalAlignment,verticalAlignment,wrapStrategy)",
-                    }
-                })
-
-            # Formatting pour la colonne E (synergies) sans merge
+        # Merge vertical A..D de chaque bloc (no empty under compo), regroupés après le style :
+        # MERGE_COLUMNS fusionne chaque colonne séparément, une seule requête par bloc
+        for row_start, height, _ in blocks:
             requests.append({
-                "repeatCell": {
+                "mergeCells": {
                     "range": {
                         "sheetId": sheet_id,
                         "startRowIndex": row_start - 1,
                         "endRowIndex": row_start - 1 + height,
-                        "startColumnIndex": 4,
-                        "endColumnIndex": 5,
-                    },
-                    "cell": {
-                        "userEnteredFormat": {
-                            "horizontalAlignment": "CENTER",
-                            "verticalAlignment": "MIDDLE",
-                        }
+                        "startColumnIndex": 0,
+                        "endColumnIndex": 4,
                     },
-                    "fields": "userEnteredFormat(horizontalAlignment,verticalAlignment)",
+                    "mergeType": "MERGE_COLUMNS",
                 }
             })
 
         # --- FINAL TOUCH: Alignement global (Centré partout) ---
+        # Couvre aussi A..D fusionnées et la colonne E : pas d'alignement par zone avant
         requests.append({
             "repeatCell": {
                 "range": {
@@ -968,11 +1096,63 @@ def update_google_sheet(
                     }
                 })
 
-        if requests:
-            service.spreadsheets().batchUpdate(
+        def _apply_format() -> None:
+            _retry(service.spreadsheets().batchUpdate(
                 spreadsheetId=spreadsheet_id,
                 body={"requests": requests},
-            ).execute()
+            ).execute)
+
+        # Écriture (texte + formules IMAGE) via values:batchUpdate. Passe par la session
+        # gspread : le client httplib2 de `service` n'est pas thread-safe.
+        # La feuille vient d'être vidée : inutile d'envoyer les cellules vides en fin de ligne
+        values = [_trim_row(row) for row in all_rows]
+
+        def _write_values() -> None:
+            _retry(lambda: spreadsheet.values_batch_update({
+                "valueInputOption": "USER_ENTERED",
+                "data": [{"range": absolute_range_name(sheet_name, "A1"), "values": values}],
+            }))
+
+        # Empreinte du rendu (valeurs + mise en forme) : si l'onglet a déjà été écrit à
+        # l'identique par un run précédent ET que son contenu actuel est toujours celui-là
+        # (un collaborateur a pu le modifier ou le vider), on ne le vide ni ne le réécrit.
+        # META_FORCE_UPDATE=1 force la réécriture (ex. après une retouche de mise en forme).
+        state_path = _cache_dir() / "sheet_state.json"
+        state = _load_json(state_path)
+        state_key = f"{spreadsheet_id}/{sheet_id}"
+        fingerprint = hashlib.sha256(orjson.dumps([values, requests])).hexdigest()
+        force = os.getenv("META_FORCE_UPDATE", "").strip() in ("1", "true", "yes")
+        if not created_new and not force and state.get(state_key) == fingerprint:
+            # Une seule lecture de tout l'onglet (formules brutes, lignes vides finales omises)
+            remote = _retry(lambda: spreadsheet.values_get(
+                absolute_range_name(sheet_name), params={"valueRenderOption": "FORMULA"},
+            )).get("values", [])
+            remote = [_trim_row([v if isinstance(v, str) else str(v) for v in row]) for row in remote]
+            expected = values[:]
+            while expected and not expected[-1]:
+                expected.pop()
+            while remote and not remote[-1]:
+                remote.pop()
+            if remote == expected:
+                print("✅ Google Sheet déjà à jour, aucune écriture")
+                return
+
+        # Un onglet tout juste créé est vide : rien à effacer
+        if not created_new:
+            _retry(worksheet.clear)
+
+        # Les deux endpoints sont indépendants : en parallèle si la grille actuelle contient
+        # déjà les données, sinon on attend le redimensionnement (fait par le batchUpdate).
+        if worksheet.row_count >= needed_rows and worksheet.col_count >= needed_cols:
+            with ThreadPoolExecutor(max_workers=2) as ex:
+                futures = [ex.submit(_apply_format), ex.submit(_write_values)]
+                for fut in futures:
+                    fut.result()
+        else:
+            _apply_format()
+            _write_values()
+        state[state_key] = fingerprint
+        _save_json(state_path, state)
         
         print(f"✅ Google Sheet mis à jour avec succès!")
         print(f"📊 {len(meta_list)} compositions ajoutées")
@@ -985,11 +1165,15 @@ def main():
     """Fonction principale."""
     print("🚀 Démarrage de la mise à jour du Google Sheet...")
     print(f"📖 Chargement du fichier {YAML_FILE}...")
-    data = load_yaml(YAML_FILE)
-    print("✅ Fichier YAML chargé avec succès")
     print("🔐 Connexion à Google Sheets...")
-    client, service = init_google_sheets()
-    print("✅ Connexion établie")
+    # Lecture du YAML et authentification sont indépendantes : en parallèle
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        data_future = ex.submit(load_yaml, YAML_FILE)
+        auth_future = ex.submit(init_google_sheets)
+        data = data_future.result()
+        print("✅ Fichier YAML chargé avec succès")
+        client, service = auth_future.result()
+        print("✅ Connexion établie")
     # ID par défaut via variable d'environnement
     spreadsheet_id = os.getenv("GOOGLE_SHEET_ID")
     if not spreadsheet_id: